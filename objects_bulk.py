@@ -25,31 +25,60 @@ Behavior:
 
 from __future__ import annotations
 import argparse
+import asyncio
 import csv
+import hashlib
+import io
+import itertools
 import json
+import logging
 import os
 import sys
 import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from jinja2 import Environment, FileSystemLoader, StrictUndefined
 
 
 # --- .env loading (dotenv first, tiny fallback second) -----------------------
-def _tiny_load_env_file(path: str = ".env"):
+_ENV_CACHE: Optional[Dict[str, str]] = None
+_ENV_KEY: Optional[Tuple[str, int, int]] = None  # (resolved path, st_mtime_ns, st_size) of the cached parse
+
+
+def _parse_env_file(path: str = ".env") -> Dict[str, str]:
+    """Parse KEY=value lines; cached until the file's path, mtime or size changes."""
+    global _ENV_CACHE, _ENV_KEY
     p = Path(path)
-    if not p.exists():
-        return
-    for line in p.read_text(encoding="utf-8").splitlines():
-        line = line.strip()
-        if not line or line.startswith("#") or "=" not in line:
-            continue
-        k, v = line.split("=", 1)
-        k = k.strip()
-        v = v.strip().strip('"').strip("'")
-        if k and k not in os.environ:
+    try:
+        st = p.stat()
+    except OSError:
+        return {}
+    key = (str(p.resolve()), st.st_mtime_ns, st.st_size)
+    if _ENV_CACHE is None or key != _ENV_KEY:
+        parsed: Dict[str, str] = {}
+        for line in p.read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            k, v = line.split("=", 1)
+            k = k.strip()
+            if k:
+                parsed[k] = v.strip().strip('"').strip("'")
+        _ENV_CACHE, _ENV_KEY = parsed, key
+    return _ENV_CACHE
+
+
+def _tiny_load_env_file(path: str = ".env"):
+    for k, v in _parse_env_file(path).items():
+        if k not in os.environ:
             os.environ[k] = v
 
 try:
@@ -59,9 +88,54 @@ except Exception:
     _tiny_load_env_file(".env")
 # ---------------------------------------------------------------------------
 
+# --- JSON (orjson if installed, stdlib fallback) ----------------------------
+try:
+    import orjson
+
+    def _dumps(obj, pretty: bool = False) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0).decode("utf-8")
+
+    _loads = orjson.loads  # orjson.JSONDecodeError subclasses json.JSONDecodeError
+except ImportError:
+    def _dumps(obj, pretty: bool = False) -> str:
+        return json.dumps(obj, indent=2 if pretty else None)
+
+    _loads = json.loads
+# ---------------------------------------------------------------------------
+
 
 ROOT = Path(__file__).resolve().parent
 LOGIN_SCRIPT = ROOT / "ztb_login.py"
+LOGIN_LOCK = ROOT / ".ztb_login.lock"
+LOGIN_LOCK_TIMEOUT = 120  # seconds to wait for another process's login (Windows polling)
+DEFAULT_TEMPLATE = "templates/object_payload.json.j2"
+# sha256 of the shipped template: while it matches, payloads are built by build_payload()
+# (or, with --use-template, its rendered output is trusted and sent without a JSON re-parse)
+STOCK_TEMPLATE_SHA256 = "ba40d7595cf1a16b9261ee12039b589e3605fbd4439c9b8c9faef25edda7707e"
+
+# A payload is a dict, or an already-rendered JSON string from a trusted template.
+Payload = Union[Dict[str, object], str]
+
+_ALLOWED_TYPES = frozenset({"domains", "network"})
+
+# Transient statuses retried with backoff (sync Retry adapter and the --async loop alike)
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+_RETRY_TOTAL = 5
+_RETRY_BACKOFF = 0.3
+
+# type → member_attributes key, mirroring templates/object_payload.json.j2
+_MEMBER_ATTR_KEY = {"domains": "fqdn", "network": "ip_prefix_local"}
+
+# Per-group output goes through one handler (its lock) instead of bare print() from every worker.
+logger = logging.getLogger("objects_bulk")
+
+# Prefer logging in in-process; fall back to running ztb_login.py as a subprocess.
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+try:
+    import ztb_login
+except Exception:
+    ztb_login = None
 
 
 def getenv_clean(key: str, default: str = "") -> str:
@@ -72,13 +146,94 @@ def getenv_clean(key: str, default: str = "") -> str:
 def _normalize_base_root(raw: str) -> str:
     """Accept https://foo-api.goairgap.com[/api/v3|/api/v2] → return clean root"""
     base = (raw or "").strip().rstrip("/")
-    if base.endswith("/api/v3") or base.endswith("/api/v2"):
-        base = base.rsplit("/api/", 1)[0]
-    return base
+    return base.removesuffix("/api/v3").removesuffix("/api/v2")
+
+
+def _run_login() -> bool:
+    """Put a fresh BEARER into os.environ (and .env) via ztb_login."""
+    if ztb_login is not None:
+        try:
+            os.environ["BEARER"] = ztb_login.fetch_bearer()
+            return True
+        except SystemExit as e:
+            print(f"ERROR: ztb_login failed: {e.code}", file=sys.stderr)
+            return False
+        except Exception as e:
+            # e.g. a non-JSON 200 response or an unwritable .env; fail like the subprocess path would
+            print(f"ERROR: ztb_login failed: {e}", file=sys.stderr)
+            return False
+    try:
+        subprocess.run([sys.executable, str(LOGIN_SCRIPT)], check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"ERROR: ztb_login.py failed with exit code {e.returncode}", file=sys.stderr)
+        return False
+    # Take only the new token from .env; leave any exported ZTB_API_BASE/API_KEY alone.
+    os.environ["BEARER"] = _env_file_bearer()
+    return True
+
+
+def _env_file_bearer() -> str:
+    """BEARER as currently written in .env (without touching os.environ)."""
+    return _parse_env_file(".env").get("BEARER", "").strip()
+
+
+def _lock_file(fh) -> None:
+    if os.name == "nt":
+        import msvcrt
+        # LK_LOCK gives up after ~10s, shorter than a login can take: poll non-blocking instead.
+        deadline = time.monotonic() + LOGIN_LOCK_TIMEOUT
+        while True:
+            fh.seek(0)
+            try:
+                msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.2)
+    else:
+        import fcntl
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+
+
+def _unlock_file(fh) -> None:
+    if os.name == "nt":
+        import msvcrt
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def _login_file_lock():
+    """Exclusive OS-level lock so parallel workers/processes don't all run ztb_login at once.
+
+    If the lock file can't be opened or locked (e.g. read-only script dir), proceed unlocked.
+    """
+    try:
+        fh = open(LOGIN_LOCK, "a+b")
+    except OSError as e:
+        print(f"WARNING: cannot open {LOGIN_LOCK} ({e}); refreshing without a lock", file=sys.stderr)
+        yield
+        return
+    with fh:
+        try:
+            _lock_file(fh)
+            locked = True
+        except OSError as e:
+            print(f"WARNING: cannot lock {LOGIN_LOCK} ({e}); refreshing without a lock", file=sys.stderr)
+            locked = False
+        try:
+            yield
+        finally:
+            if locked:
+                _unlock_file(fh)
 
 
 def _ensure_bearer_present_or_login():
-    """If BEARER missing, invoke ztb_login.py to fetch it, then reload .env."""
+    """If BEARER missing, invoke ztb_login to fetch it."""
     bearer = getenv_clean("BEARER")
     if bearer:
         return
@@ -86,80 +241,192 @@ def _ensure_bearer_present_or_login():
         print("ERROR: BEARER not set and ztb_login.py not found. Please run login manually.", file=sys.stderr)
         sys.exit(1)
     print("🔐 BEARER missing — invoking ztb_login.py to obtain a fresh token…")
-    try:
-        subprocess.run([sys.executable, str(LOGIN_SCRIPT)], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"ERROR: ztb_login.py failed with exit code {e.returncode}", file=sys.stderr)
+    if not _run_login():
         sys.exit(1)
-    # reload env
-    try:
-        from dotenv import load_dotenv as _ld
-        _ld(override=True)
-    except Exception:
-        _tiny_load_env_file(".env")
 
 
-def _refresh_bearer_and_update_session(session: requests.Session) -> bool:
-    """Invoke ztb_login.py, reload .env, and update Authorization header."""
+def _refresh_bearer(stale_auth: Optional[str]) -> Optional[str]:
+    """Invoke ztb_login and return the new raw BEARER (None on failure).
+
+    Touches no client state, so it is safe to run off the event loop via asyncio.to_thread.
+    """
     if not LOGIN_SCRIPT.exists():
         print("ERROR: Cannot refresh token automatically (ztb_login.py not found).", file=sys.stderr)
-        return False
-    print("🔄 401 Unauthorized — refreshing token via ztb_login.py and retrying once…")
-    try:
-        subprocess.run([sys.executable, str(LOGIN_SCRIPT)], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"ERROR: ztb_login.py failed with exit code {e.returncode}", file=sys.stderr)
-        return False
-    try:
-        from dotenv import load_dotenv as _ld
-        _ld(override=True)
-    except Exception:
-        _tiny_load_env_file(".env")
+        return None
+    # Our token may not come from .env at all (e.g. an exported BEARER), so only trust
+    # a .env token that another process wrote while we were waiting for the lock.
+    before = _env_file_bearer()
+    with _login_file_lock():
+        after = _env_file_bearer()
+        if after and after != before and f"Bearer {after}" != stale_auth:
+            os.environ["BEARER"] = after
+        else:
+            print("🔄 401 Unauthorized — refreshing token via ztb_login.py and retrying once…")
+            if not _run_login():
+                return None
     new_bearer_raw = getenv_clean("BEARER")
     if not new_bearer_raw:
         print("ERROR: ztb_login.py ran but BEARER is still empty.", file=sys.stderr)
+        return None
+    return new_bearer_raw
+
+
+def _refresh_bearer_and_update_session(session: requests.Session) -> bool:
+    """Invoke ztb_login, then update the session's Authorization header."""
+    new_bearer_raw = _refresh_bearer(session.headers.get("Authorization"))
+    if not new_bearer_raw:
         return False
     session.headers["Authorization"] = f"Bearer {new_bearer_raw}"
     return True
 
 
-def read_and_group(csv_path: Path) -> Dict[Tuple[str, str], Dict[str, object]]:
-    """Group rows by (name,type); de-duplicate items per group."""
-    groups: Dict[Tuple[str, str], Dict[str, object]] = {}
-    with csv_path.open(newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+def build_payload(name: str, typ: str, items: List[str]) -> Dict[str, object]:
+    """Build the same payload as the stock template, without a Jinja render + JSON re-parse."""
+    attr = _MEMBER_ATTR_KEY.get(typ)
+    return {
+        "name": name,
+        "type": typ,
+        "autonomous": False,
+        "owner": "user",
+        "member_attributes": {attr: items} if attr else {},
+    }
+
+
+def _preview(payload: Payload, pretty: bool) -> str:
+    """Format a payload for --verbose/--dry-run; trusted JSON strings are re-laid out too."""
+    if isinstance(payload, str):
+        try:
+            payload = _loads(payload)
+        except ValueError:
+            return payload  # not valid JSON: show it as rendered
+    return _dumps(payload, pretty=pretty)
+
+
+def _batch_item_statuses(resp: requests.Response, count: int) -> List[Tuple[int, str]]:
+    """Split a batch response into per-item (status, snippet).
+
+    Accepts a JSON array (top level or under "result"/"results") of per-item
+    objects carrying "status"/"status_code"/"code"; items without their own
+    status inherit the batch response's status (a bare 207 thus stays 207,
+    which the caller reports as an unknown outcome).
+    """
+    try:
+        body = resp.json()
+    except ValueError:
+        body = None
+    if isinstance(body, dict):
+        body = next((body[k] for k in ("result", "results") if isinstance(body.get(k), list)), None)
+    entries = body if isinstance(body, list) and len(body) == count else [None] * count
+
+    out: List[Tuple[int, str]] = []
+    for entry in entries:
+        status = resp.status_code
+        if isinstance(entry, dict):
+            status = next((entry[k] for k in ("status", "status_code", "code") if isinstance(entry.get(k), int)), status)
+        if status in (200, 201, 202, 409):
+            snippet = ""
+        else:
+            snippet = (str(entry) if entry is not None else (resp.text or ""))[:300].replace("\n", " ")
+        out.append((status, snippet))
+    return out
+
+
+def _batch_unsupported(resp: requests.Response) -> bool:
+    """True if the server refused the array body itself, rather than a group inside it."""
+    if resp.status_code in (404, 405, 415, 501):
+        return True
+    text = (resp.text or "").lower()
+    return resp.status_code in (400, 422) and "batch" in text and ("not supported" in text or "unsupported" in text)
+
+
+def read_and_group(csv_path: Path) -> Tuple[List[str], List[str], List[List[str]]]:
+    """Group rows by (name,type); de-duplicate items per group.
+
+    Returns parallel lists (names, types, items) indexed by group, in first-seen order.
+    """
+    names: List[str] = []
+    types: List[str] = []
+    items: List[List[str]] = []
+    index: Dict[Tuple[str, str], int] = {}  # only needed while parsing
+    # One read() for the whole file, then parse from memory (no per-row small reads).
+    data = csv_path.read_bytes().decode("utf-8")
+    with io.StringIO(data, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return names, types, items  # empty file: nothing to do
+        header = [h.strip() for h in header]
+        try:
+            ni, ti, ii = header.index("name"), header.index("type"), header.index("items")
+        except ValueError:
+            missing = [c for c in ("name", "type", "items") if c not in header]
+            raise SystemExit(f"❌ CSV missing required column: {missing}. Required: name,type,items")
+        width = max(ni, ti, ii) + 1
         for i, row in enumerate(reader, start=2):
-            try:
-                name = (row["name"] or "").strip()
-                typ = (row["type"] or "").strip().lower()
-                item = (row["items"] or "").strip()
-            except KeyError as e:
-                raise SystemExit(f"❌ CSV missing required column: {e}. Required: name,type,items")
+            if not row:
+                continue
+            if len(row) < width:
+                row = row + [""] * (width - len(row))
+            name = row[ni].strip()
+            typ = row[ti].strip()
+            item = row[ii].strip()
 
-            if not name or not typ or not item:
+            if not (name and typ and item):
                 print(f"⚠️  Skip line {i}: blank field(s): {row}")
                 continue
 
-            if typ not in {"domains", "network"}:
+            typ = typ.lower()
+            if typ not in _ALLOWED_TYPES:
                 print(f"⚠️  Skip line {i}: unsupported type '{typ}' (use 'domains' or 'network')")
                 continue
 
             key = (name, typ)
-            if key not in groups:
-                groups[key] = {"name": name, "type": typ, "items": []}
-            if item not in groups[key]["items"]:
-                groups[key]["items"].append(item)
-    return groups
+            g = index.get(key)
+            if g is None:
+                g = index[key] = len(names)
+                names.append(name)
+                types.append(typ)
+                items.append([])
+            items[g].append(item)
+    # Ordered de-dupe once per group (C-level loop) instead of a membership check per row
+    return names, types, [list(dict.fromkeys(g)) for g in items]
 
 
 def main():
     ap = argparse.ArgumentParser(description="Bulk create ZTB Objects from CSV (grouped by name+type)")
     ap.add_argument("--csv", default="objects.csv", help="Path to CSV (default: objects.csv)")
-    ap.add_argument("--template", default="templates/object_payload.json.j2",
-                    help="Jinja2 template path (default: templates/object_payload.json.j2)")
+    ap.add_argument("--template", default=DEFAULT_TEMPLATE,
+                    help=f"Jinja2 template path (default: {DEFAULT_TEMPLATE})")
+    ap.add_argument("--use-template", action="store_true",
+                    help="Render the stock template with Jinja2 too (custom templates always are)")
+    ap.add_argument("--trust-template", action="store_true",
+                    help="Send rendered template output as-is, skipping JSON validation (automatic for the stock template)")
     ap.add_argument("--dry-run", action="store_true", help="Print payloads but do not POST")
+    ap.add_argument("--dry-run-format", choices=("pretty", "compact"), default="pretty",
+                    help="Payload layout for --dry-run (default: pretty)")
     ap.add_argument("--verbose", "-v", action="store_true", help="Verbose output")
+    ap.add_argument("--concurrency", type=int, default=8,
+                    help="Number of parallel POSTs (default: 8)")
+    ap.add_argument("--batch-size", type=int, default=1,
+                    help="Groups per POST as a JSON array, if the API accepts it (default: 1)")
+    ap.add_argument("--batch-endpoint", default="",
+                    help="Path under /api/v2 for batched POSTs (default: same groups endpoint)")
+    ap.add_argument("--async", dest="use_async", action="store_true",
+                    help="POST with httpx.AsyncClient over HTTP/2 (requires httpx[http2])")
     args = ap.parse_args()
+    if args.use_async and args.batch_size > 1:
+        ap.error("--async does not support --batch-size > 1")
+    if args.concurrency < 1:
+        ap.error("--concurrency must be >= 1")
+    if args.batch_size < 1:
+        ap.error("--batch-size must be >= 1")
+
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
 
     # Ensure BEARER (may invoke ztb_login.py)
     _ensure_bearer_present_or_login()
@@ -188,72 +455,232 @@ def main():
         print(f"❌ Template not found: {template_path}")
         sys.exit(1)
 
-    groups = read_and_group(csv_path)
-    if not groups:
+    # An unmodified stock template (matched by content) is built directly in Python;
+    # any edited or custom template is rendered with Jinja.
+    is_stock = hashlib.sha256(template_path.read_bytes()).hexdigest() == STOCK_TEMPLATE_SHA256
+    use_template = args.use_template or not is_stock
+
+    names, types, items_list = read_and_group(csv_path)
+    if not names:
         print("ℹ️  Nothing to do (no valid rows).")
         return
 
-    env = Environment(
-        loader=FileSystemLoader(str(template_path.parent)),
-        undefined=StrictUndefined,
-        trim_blocks=True,
-        lstrip_blocks=True,
-    )
-    tpl = env.get_template(template_path.name)
+    # Pick the payload factory once; the per-group loop just calls it.
+    if use_template:
+        env = Environment(
+            loader=FileSystemLoader(str(template_path.parent)),
+            undefined=StrictUndefined,
+            trim_blocks=True,
+            lstrip_blocks=True,
+        )
+        render = env.get_template(template_path.name).render
+        trusted = args.trust_template or is_stock
+
+        if trusted:
+            def make_payload(name: str, typ: str, items: List[str]) -> Payload:
+                return render(name=name, type=typ, items=items)
+        else:
+            def make_payload(name: str, typ: str, items: List[str]) -> Payload:
+                return _loads(render(name=name, type=typ, items=items))
+    else:
+        make_payload = build_payload
 
-    # Create session
+    # Create session (one shared keep-alive session; pool sized to match concurrency,
+    # transient 429/5xx retried with backoff, honoring Retry-After)
     session = requests.Session()
-    session.headers.update({
+    retry = Retry(
+        total=_RETRY_TOTAL,
+        backoff_factor=_RETRY_BACKOFF,
+        status_forcelist=_RETRY_STATUSES,
+        allowed_methods=frozenset({"POST", "GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=args.concurrency, pool_maxsize=args.concurrency, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    headers = {
         "Authorization": f"Bearer {bearer_raw}",
         "Content-Type": "application/json",
         "Accept": "application/json, text/plain, */*",
         "User-Agent": "objects_bulk.py",
-    })
-
-    def _request_with_auto_refresh(method: str, url: str, *, json_payload=None, timeout=45) -> requests.Response:
-        r = session.request(method, url, json=json_payload, timeout=timeout)
+    }
+    session.headers.update(headers)
+
+    # Only one worker at a time may run ztb_login.py; the others wait and reuse its token.
+    refresh_lock = threading.Lock()
+
+    def _request_with_auto_refresh(method: str, url: str, *, json_payload=None, timeout=(5, 45)) -> requests.Response:
+        # Pre-rendered JSON strings go out as the raw body (Content-Type is already application/json).
+        if isinstance(json_payload, str):
+            body = {"data": json_payload.encode("utf-8")}
+        else:
+            body = {"json": json_payload}
+        sent_auth = session.headers.get("Authorization")
+        r = session.request(method, url, timeout=timeout, **body)
         if r.status_code == 401:
-            if _refresh_bearer_and_update_session(session):
-                r = session.request(method, url, json=json_payload, timeout=timeout)
+            with refresh_lock:
+                if session.headers.get("Authorization") != sent_auth:
+                    refreshed = True  # another worker already refreshed the token
+                else:
+                    refreshed = _refresh_bearer_and_update_session(session)
+            if refreshed:
+                r = session.request(method, url, timeout=timeout, **body)
         return r
 
     url = f"{API_V2}/groups?refresh_token=enabled"
-    created = skipped = errors = 0
+    created = skipped = errors = unknown = 0
 
-    for (name, typ), data in groups.items():
-        payload_str = tpl.render(name=name, type=typ, items=data["items"])
+    # Render all payloads up front (CPU-bound), then fan out the POSTs.
+    payloads: List[Tuple[str, str, Payload]] = []
+    # Indent only for a terminal or an explicit pretty dry-run; piped/logged verbose output stays compact.
+    if args.dry_run:
+        pretty = args.dry_run_format == "pretty"
+    else:
+        pretty = sys.stdout.isatty()
+    for i in range(len(names)):
+        name, typ, items = names[i], types[i], items_list[i]
         try:
-            payload = json.loads(payload_str)
+            payload = make_payload(name, typ, items)
         except json.JSONDecodeError as e:
-            print(f"❌ Bad JSON for group '{name}' ({typ}): {e}")
+            logger.info("❌ Bad JSON for group '%s' (%s): %s", name, typ, e)
             errors += 1
             continue
 
         if args.verbose or args.dry_run:
-            print("\n--- payload --------------------------------")
-            print(json.dumps(payload, indent=2))
-            print("-------------------------------------------")
+            logger.info("\n--- payload --------------------------------\n%s\n"
+                        "-------------------------------------------", _preview(payload, pretty))
 
         if args.dry_run:
             skipped += 1
             continue
 
+        payloads.append((name, typ, payload))
+
+    def _post_group(item: Tuple[str, str, Payload]) -> Tuple[Optional[int], str, str, str]:
+        """POST one group; return (status_code | None, name, type, error snippet)."""
+        name, typ, payload = item
         try:
             resp = _request_with_auto_refresh("POST", url, json_payload=payload)
-            if resp.status_code in (200, 201, 202):
+        except requests.RequestException as e:
+            return None, name, typ, str(e)
+        snippet = "" if resp.status_code in (200, 201, 202, 409) else (resp.text or "")[:300].replace("\n", " ")
+        return resp.status_code, name, typ, snippet
+
+    batch_url = f"{API_V2}/{args.batch_endpoint.lstrip('/')}" if args.batch_endpoint else url
+    batch_unsupported = threading.Event()
+
+    def _post_batch(batch: List[Tuple[str, str, Payload]]) -> List[Tuple[Optional[int], str, str, str]]:
+        """POST several groups as one JSON array; fall back to per-group if the server refuses arrays."""
+        if len(batch) == 1 or batch_unsupported.is_set():
+            return [_post_group(item) for item in batch]
+        try:
+            bodies = [p for _, _, p in batch]
+            if isinstance(bodies[0], str):
+                bodies = "[" + ",".join(bodies) + "]"
+            resp = _request_with_auto_refresh("POST", batch_url, json_payload=bodies)
+        except requests.RequestException as e:
+            return [(None, name, typ, str(e)) for name, typ, _ in batch]
+        if _batch_unsupported(resp):
+            if not batch_unsupported.is_set():
+                batch_unsupported.set()
+                logger.info("ℹ️  Batch POST rejected (%s) — falling back to one group per request", resp.status_code)
+            return [_post_group(item) for item in batch]
+        if resp.status_code in (400, 422):
+            # One bad group rejects the whole array: resend just this batch per group to pinpoint it.
+            return [_post_group(item) for item in batch]
+        if resp.status_code not in (200, 201, 202, 207):
+            snippet = (resp.text or "")[:300].replace("\n", " ")
+            return [(resp.status_code, name, typ, snippet) for name, typ, _ in batch]
+        return [
+            (status, name, typ, snippet)
+            for (name, typ, _), (status, snippet) in zip(batch, _batch_item_statuses(resp, len(batch)))
+        ]
+
+    async def _post_all_async(items: List[Tuple[str, str, Payload]]) -> List[Tuple[Optional[int], str, str, str]]:
+        """POST every group over one multiplexed HTTP/2 client, at most --concurrency in flight."""
+        try:
+            import httpx
+            import h2  # noqa: F401  (httpx's HTTP/2 support)
+        except ImportError:
+            raise SystemExit("❌ --async requires httpx (pip install 'httpx[http2]')")
+        sem = asyncio.Semaphore(args.concurrency)
+        async_refresh_lock = asyncio.Lock()
+        transport = httpx.AsyncHTTPTransport(
+            http2=True,
+            retries=3,  # connect errors only; statuses are retried in _post below
+            limits=httpx.Limits(max_connections=args.concurrency),
+        )
+        async with httpx.AsyncClient(
+            transport=transport,
+            headers=headers,
+            timeout=httpx.Timeout(45.0, connect=5.0),
+        ) as client:
+            async def _post(body: dict) -> "httpx.Response":
+                """POST with the same 429/5xx backoff as the sync Retry adapter, honoring Retry-After."""
+                for attempt in range(_RETRY_TOTAL + 1):
+                    r = await client.post(url, **body)
+                    if r.status_code not in _RETRY_STATUSES or attempt == _RETRY_TOTAL:
+                        return r
+                    retry_after = r.headers.get("Retry-After", "")
+                    delay = float(retry_after) if retry_after.isdigit() else _RETRY_BACKOFF * 2 ** attempt
+                    await asyncio.sleep(delay)
+                return r
+
+            async def one(item: Tuple[str, str, Payload]) -> Tuple[Optional[int], str, str, str]:
+                name, typ, payload = item
+                body = {"content": payload.encode("utf-8")} if isinstance(payload, str) else {"json": payload}
+                async with sem:
+                    try:
+                        sent_auth = client.headers.get("Authorization")
+                        r = await _post(body)
+                        if r.status_code == 401:
+                            async with async_refresh_lock:
+                                if client.headers.get("Authorization") != sent_auth:
+                                    refreshed = True  # another task already refreshed the token
+                                else:
+                                    # Login runs in a thread; the header is only written here, on the loop.
+                                    new_bearer = await asyncio.to_thread(_refresh_bearer, sent_auth)
+                                    if new_bearer:
+                                        client.headers["Authorization"] = f"Bearer {new_bearer}"
+                                    refreshed = bool(new_bearer)
+                            if refreshed:
+                                r = await _post(body)
+                    except httpx.HTTPError as e:
+                        return None, name, typ, str(e)
+                snippet = "" if r.status_code in (200, 201, 202, 409) else (r.text or "")[:300].replace("\n", " ")
+                return r.status_code, name, typ, snippet
+
+            return await asyncio.gather(*(one(item) for item in items))
+
+    def _iter_results():
+        if args.use_async:
+            yield from asyncio.run(_post_all_async(payloads))
+            return
+        it = iter(payloads)
+        batches = iter(lambda: list(itertools.islice(it, args.batch_size)), [])
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            yield from itertools.chain.from_iterable(executor.map(_post_batch, batches))
+
+    if payloads:
+        for status, name, typ, snippet in _iter_results():
+            if status is None:
+                logger.info("❌ Request failed for '%s' (%s): %s", name, typ, snippet)
+                errors += 1
+            elif status in (200, 201, 202):
                 created += 1
                 if args.verbose:
-                    print(f"✅ Created '{name}' ({typ})")
-            elif resp.status_code == 409:
-                print(f"⚠️  Exists (409): '{name}' ({typ}) — skipping")
+                    logger.info("✅ Created '%s' (%s)", name, typ)
+            elif status == 409:
+                logger.info("⚠️  Exists (409): '%s' (%s) — skipping", name, typ)
                 skipped += 1
+            elif status == 207:
+                # Multi-status batch reply without a per-item entry for this group
+                logger.info("❔ Outcome unknown (207) for '%s' (%s): %s", name, typ, snippet)
+                unknown += 1
             else:
-                snippet = (resp.text or "")[:300].replace("\n", " ")
-                print(f"❌ Error {resp.status_code} creating '{name}' ({typ}): {snippet}")
+                logger.info("❌ Error %s creating '%s' (%s): %s", status, name, typ, snippet)
                 errors += 1
-        except requests.RequestException as e:
-            print(f"❌ Request failed for '{name}' ({typ}): {e}")
-            errors += 1
 
     print("\n== Summary ==")
     print(f"Created: {created}")
@@ -262,6 +689,8 @@ def main():
     else:
         print(f"Skipped: {skipped}")
     print(f"Errors:  {errors}")
+    if unknown:
+        print(f"Unknown: {unknown} (batch reply had no per-item status; check these in the UI)")
 
 
 if __name__ == "__main__":
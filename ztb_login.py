@@ -22,7 +22,7 @@ import os
 import re
 import sys
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 
 import requests
 
@@ -44,17 +44,18 @@ def get_env(name: str, *, required: bool = True) -> Optional[str]:
     return v
 
 
-def upsert_env_var(key: str, value: str) -> None:
-    """Upsert KEY="value" in .env (create file if missing)."""
+def upsert_env_vars(values: Dict[str, str]) -> None:
+    """Upsert KEY="value" lines in .env with a single read + write (create file if missing)."""
     text = ENV_PATH.read_text(encoding="utf-8") if ENV_PATH.exists() else ""
-    pattern = re.compile(rf"^{re.escape(key)}=.*$", re.MULTILINE)
-    line = f'{key}="{value}"'
-    if pattern.search(text):
-        text = pattern.sub(line, text)
-    else:
-        if text and not text.endswith("\n"):
-            text += "\n"
-        text += line + "\n"
+    for key, value in values.items():
+        pattern = re.compile(rf"^{re.escape(key)}=.*$", re.MULTILINE)
+        line = f'{key}="{value}"'
+        if pattern.search(text):
+            text = pattern.sub(lambda _m: line, text)
+        else:
+            if text and not text.endswith("\n"):
+                text += "\n"
+            text += line + "\n"
     ENV_PATH.write_text(text, encoding="utf-8")
 
 
@@ -116,12 +117,14 @@ def parse_expiry_fields(result: dict) -> Tuple[Optional[str], Optional[int]]:
     return iso, seconds
 
 
-def main() -> None:
-    ap = argparse.ArgumentParser(description="Obtain a ZTB delegate token and write it into .env")
-    ap.add_argument("--quiet", action="store_true", help="Only print the export line (suppress status text)")
-    ap.add_argument("--no-write", action="store_true", help="Do not write .env; only print export line")
-    args = ap.parse_args()
+def login() -> Tuple[str, dict, str]:
+    """
+    Call the API-key login endpoint.
 
+    Returns:
+      (raw delegate token, login "result" object, normalized API base).
+    Raises SystemExit with a readable message on any failure.
+    """
     # Prefer ZTB_API_BASE, fall back to legacy ZIA_API_BASE
     base_raw = (os.getenv("ZTB_API_BASE") or os.getenv("ZIA_API_BASE") or "").strip()
     if not base_raw:
@@ -159,14 +162,41 @@ def main() -> None:
         # Show whatever we got back to help debugging
         raise SystemExit(f"❌ Unexpected JSON shape:\n{json.dumps(resp.json(), indent=2)}")
 
+    return token, result, base
+
+
+def _write_token(token: str, iso_exp: Optional[str]) -> None:
+    # Save only the RAW token (no "Bearer " prefix)
+    values = {"BEARER": token}
+    if iso_exp:
+        values["BEARER_EXPIRES_AT"] = iso_exp
+    upsert_env_vars(values)
+
+
+def fetch_bearer() -> str:
+    """
+    In-process login for callers like objects_bulk.py (no subprocess / .env re-read).
+    Returns the RAW token and upserts it into .env.
+    """
+    token, result, _base = login()
+    iso_exp, _seconds = parse_expiry_fields(result)
+    _write_token(token, iso_exp)
+    return token
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Obtain a ZTB delegate token and write it into .env")
+    ap.add_argument("--quiet", action="store_true", help="Only print the export line (suppress status text)")
+    ap.add_argument("--no-write", action="store_true", help="Do not write .env; only print export line")
+    args = ap.parse_args()
+
+    token, result, base = login()
+
     # Optional expiry capture
     iso_exp, seconds = parse_expiry_fields(result)
 
     if not args.no_write:
-        # Save only the RAW token (no "Bearer " prefix)
-        upsert_env_var("BEARER", token)
-        if iso_exp:
-            upsert_env_var("BEARER_EXPIRES_AT", iso_exp)
+        _write_token(token, iso_exp)
 
     # Status lines
     if not args.quiet: